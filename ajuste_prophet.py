@@ -0,0 +1,131 @@
+# ajuste_prophet.py
+# Busca de hiperparâmetros do Prophet por validação cruzada.
+#
+# Cada combinação da grade é avaliada com prophet.diagnostics.cross_validation
+# (cutoffs em paralelo). Os resultados das dobras ficam em cache no disco, chaveados
+# pelo histórico de vendas e pelos parâmetros, então uma nova execução só calcula as
+# combinações que ainda não foram vistas. Os melhores parâmetros de cada SKU são
+# gravados em ARQUIVO_MELHORES_PARAMETROS e usados pelo simulador.py e projeto2.py.
+import hashlib
+import itertools
+import json
+import logging
+import os
+
+import joblib
+import pandas as pd
+from prophet import Prophet
+from prophet.diagnostics import cross_validation, performance_metrics
+
+ARQUIVO_MELHORES_PARAMETROS = 'melhores_parametros.json'
+PASTA_CACHE_AJUSTE = 'cache_ajuste'
+GRADE_PARAMETROS = {
+    'changepoint_prior_scale': [0.001, 0.01, 0.1, 0.5],
+    'seasonality_prior_scale': [0.01, 0.1, 1.0, 10.0],
+    'seasonality_mode': ['additive', 'multiplicative'],
+}
+CV_INICIAL = '60 days'
+CV_PERIODO = '7 days'
+CV_HORIZONTE = '7 days'
+CV_PARALELISMO = 'processes'
+METRICA_SELECAO = 'rmse'
+
+logging.getLogger('prophet').setLevel(logging.ERROR)
+logging.getLogger('cmdstanpy').setLevel(logging.ERROR)
+
+
+def carregar_melhores_parametros(sku) -> dict:
+    if not os.path.exists(ARQUIVO_MELHORES_PARAMETROS):
+        return {}
+    with open(ARQUIVO_MELHORES_PARAMETROS, encoding='utf-8') as f:
+        melhores = json.load(f)
+    return melhores.get(str(sku), {}).get('parametros', {})
+
+
+def salvar_melhores_parametros(sku, parametros: dict, metricas: dict):
+    melhores = {}
+    if os.path.exists(ARQUIVO_MELHORES_PARAMETROS):
+        with open(ARQUIVO_MELHORES_PARAMETROS, encoding='utf-8') as f:
+            melhores = json.load(f)
+    melhores[str(sku)] = {'parametros': parametros, **metricas}
+    with open(ARQUIVO_MELHORES_PARAMETROS, 'w', encoding='utf-8') as f:
+        json.dump(melhores, f, indent=2, ensure_ascii=False)
+
+
+def gerar_combinacoes(grade: dict = GRADE_PARAMETROS) -> list:
+    chaves = list(grade)
+    return [dict(zip(chaves, valores)) for valores in itertools.product(*grade.values())]
+
+
+def assinatura_dados(df_prophet: pd.DataFrame) -> str:
+    hashes = pd.util.hash_pandas_object(df_prophet[['ds', 'y']], index=False).values
+    return hashlib.sha1(hashes.tobytes()).hexdigest()
+
+
+def _arquivo_cache(sku, assinatura: str, parametros: dict) -> str:
+    config = json.dumps({'parametros': parametros, 'inicial': CV_INICIAL, 'periodo': CV_PERIODO,
+                         'horizonte': CV_HORIZONTE}, sort_keys=True)
+    chave = hashlib.sha1(f"{sku}|{assinatura}|{config}".encode('utf-8')).hexdigest()
+    return os.path.join(PASTA_CACHE_AJUSTE, f"{chave}.joblib")
+
+
+def historico_suficiente(df_prophet: pd.DataFrame) -> bool:
+    # cross_validation precisa de CV_INICIAL de treino mais um CV_HORIZONTE para o primeiro corte
+    if df_prophet.empty:
+        return False
+    periodo = df_prophet['ds'].max() - df_prophet['ds'].min()
+    return periodo >= pd.Timedelta(CV_INICIAL) + pd.Timedelta(CV_HORIZONTE)
+
+
+def avaliar_parametros(df_prophet: pd.DataFrame, parametros: dict, sku, assinatura: str = None) -> pd.DataFrame:
+    # Retorna as previsões das dobras (saída de cross_validation), usando o cache quando houver
+    assinatura = assinatura or assinatura_dados(df_prophet)
+    caminho = _arquivo_cache(sku, assinatura, parametros)
+    if os.path.exists(caminho):
+        return joblib.load(caminho)
+    modelo = Prophet(**parametros)
+    modelo.fit(df_prophet)
+    df_cv = cross_validation(modelo, initial=CV_INICIAL, period=CV_PERIODO, horizon=CV_HORIZONTE,
+                             parallel=CV_PARALELISMO, disable_tqdm=True)
+    os.makedirs(PASTA_CACHE_AJUSTE, exist_ok=True)
+    joblib.dump(df_cv, caminho)
+    return df_cv
+
+
+def buscar_melhores_parametros(df_prophet: pd.DataFrame, sku, grade: dict = GRADE_PARAMETROS):
+    # Retorna None (sem gravar parâmetros) quando o SKU não tem histórico para a validação cruzada
+    if not historico_suficiente(df_prophet):
+        print(f"⚠️ SKU {sku}: histórico curto para validação cruzada "
+              f"(mínimo {CV_INICIAL} + {CV_HORIZONTE}); mantendo os parâmetros padrão.")
+        return None
+    assinatura = assinatura_dados(df_prophet)
+    resultados = []
+    for parametros in gerar_combinacoes(grade):
+        df_cv = avaliar_parametros(df_prophet, parametros, sku, assinatura)
+        metricas = performance_metrics(df_cv, metrics=['rmse', 'mae', 'mape'], rolling_window=1)
+        resultados.append({**parametros, **metricas.iloc[0].drop('horizon').to_dict()})
+    df_resultados = pd.DataFrame(resultados).sort_values(METRICA_SELECAO).reset_index(drop=True)
+
+    melhor = df_resultados.iloc[0]
+    parametros = {chave: melhor[chave] for chave in grade}
+    parametros = {chave: (valor.item() if hasattr(valor, 'item') else valor) for chave, valor in parametros.items()}
+    salvar_melhores_parametros(sku, parametros, {m: float(melhor[m]) for m in ('rmse', 'mae', 'mape') if m in melhor})
+    return df_resultados
+
+
+if __name__ == "__main__":
+    from simulador import SKU_PRODUTO, carregar_dados_treino
+
+    print("--- Ajuste de Hiperparâmetros do Prophet ---")
+    sku = input(f"SKU a ajustar (Enter para {SKU_PRODUTO}): ").strip() or SKU_PRODUTO
+    df_prophet = carregar_dados_treino(sku)
+    if df_prophet.empty:
+        print(f"❌ Nenhum histórico encontrado para o SKU {sku}.")
+    else:
+        total = len(gerar_combinacoes())
+        print(f"\n Avaliando {total} combinações com validação cruzada (cache em '{PASTA_CACHE_AJUSTE}/')...")
+        df_resultados = buscar_melhores_parametros(df_prophet, sku)
+        if df_resultados is not None:
+            print(df_resultados.head(5).to_string(index=False))
+            print(f"\n✅ Melhores parâmetros do SKU {sku} salvos em '{ARQUIVO_MELHORES_PARAMETROS}':")
+            print(json.dumps(carregar_melhores_parametros(sku), indent=2))
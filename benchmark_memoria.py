@@ -0,0 +1,73 @@
+# benchmark_memoria.py
+# Compara a memória das previsões (saída completa do Prophet) e do histórico de
+# estado (como lido de estado_estoque.csv) com o formato compacto de
+# modelo_dados.py, num cenário de rede: 1000 SKUs x 2 anos de dias.
+import time
+
+import numpy as np
+import pandas as pd
+
+from modelo_dados import compactar_previsao, compactar_estado, memoria_mb
+
+QUANTIDADE_SKUS = 1000
+QUANTIDADE_DIAS = 730
+DATA_INICIAL = pd.Timestamp('2024-01-01')
+COLUNAS_PROPHET = [
+    'trend', 'yhat_lower', 'yhat_upper', 'trend_lower', 'trend_upper',
+    'additive_terms', 'additive_terms_lower', 'additive_terms_upper',
+    'weekly', 'weekly_lower', 'weekly_upper', 'yearly', 'yearly_lower', 'yearly_upper',
+    'multiplicative_terms', 'multiplicative_terms_lower', 'multiplicative_terms_upper', 'yhat',
+]
+COLUNAS_ESTADO = ['kg_descongelando_d1', 'kg_descongelando_d2', 'kg_pronto_venda_dia1',
+                  'kg_pronto_venda_dia2', 'perda_real', 'venda_real']
+
+
+def gerar_previsao_original(rng) -> pd.DataFrame:
+    # Mesmas colunas e tipos que Prophet.predict devolve (com sazonalidade anual): ds datetime64, resto float64
+    valores = rng.normal(120, 15, size=(QUANTIDADE_DIAS, len(COLUNAS_PROPHET)))
+    df = pd.DataFrame(valores, columns=COLUNAS_PROPHET)
+    df.insert(0, 'ds', pd.date_range(DATA_INICIAL, periods=QUANTIDADE_DIAS))
+    return df
+
+
+def gerar_estado_original(rng) -> pd.DataFrame:
+    # Como o read_csv(parse_dates=['data_atual']) do dashboard: data datetime64, kg float64
+    valores = rng.normal(60, 20, size=(QUANTIDADE_DIAS, len(COLUNAS_ESTADO)))
+    df = pd.DataFrame(valores, columns=COLUNAS_ESTADO)
+    df.insert(0, 'data_atual', pd.date_range(DATA_INICIAL, periods=QUANTIDADE_DIAS))
+    return df
+
+
+def comparar(nome, originais: dict, compactas: dict):
+    antes, depois = memoria_total_mb(originais), memoria_total_mb(compactas)
+    print(f"{nome:<10} {antes:>10.1f} MB {depois:>10.1f} MB {antes / depois:>8.1f}x")
+
+
+def memoria_total_mb(tabelas: dict) -> float:
+    return sum(memoria_mb(df) for df in tabelas.values())
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(42)
+    skus = [str(384706 + i) for i in range(QUANTIDADE_SKUS)]
+    print(f"--- Benchmark de memória: {QUANTIDADE_SKUS} SKUs x {QUANTIDADE_DIAS} dias ---")
+
+    # Como no cache de previsões, no pool da API e nos arquivos de estado: uma tabela por SKU
+    inicio = time.perf_counter()
+    originais = {sku: gerar_previsao_original(rng) for sku in skus}
+    estados_originais = {sku: gerar_estado_original(rng) for sku in skus}
+    print(f" Dados sintéticos gerados em {time.perf_counter() - inicio:.1f}s "
+          f"({QUANTIDADE_SKUS * QUANTIDADE_DIAS:,} linhas por tabela)")
+
+    inicio = time.perf_counter()
+    compactas = {sku: compactar_previsao(df) for sku, df in originais.items()}
+    estados_compactos = {sku: compactar_estado(df) for sku, df in estados_originais.items()}
+    print(f" Compactação em {time.perf_counter() - inicio:.1f}s\n")
+
+    print(f"{'Tabela':<10} {'Original':>13} {'Compacta':>13} {'Redução':>9}")
+    comparar('Previsões', originais, compactas)
+    comparar('Estado', estados_originais, estados_compactos)
+
+    erro_maximo = max(np.abs(originais[sku]['yhat'].to_numpy() - compactas[sku]['yhat'].to_numpy()).max()
+                      for sku in skus)
+    print(f"\nMaior diferença em yhat após float32: {erro_maximo:.6f} kg")
@@ -2,7 +2,10 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import os
-from simulador import executar_simulacao_dashboard
+from simulador import executar_simulacao_dashboard, SKU_PRODUTO
+from monitor_vendas import MonitorVendas
+from leitura_incremental import LeitorCsvIncremental, assinatura_arquivo
+from modelo_dados import compactar_estado, expandir_estado
 import plotly.graph_objects as go
 import joblib
 from datetime import date
@@ -13,6 +16,11 @@ def resetar_simulacao():
     caminho = "estado_estoque.csv"
     if os.path.exists(caminho):
         df = pd.read_csv(caminho, parse_dates=["data_atual"])
+        # Desfaz também a atualização do monitor feita com a venda dessa rodada
+        if len(df) and "venda_real" in df.columns and pd.notna(df["venda_real"].iloc[-1]):
+            monitor = MonitorVendas()
+            if monitor.desfazer(SKU_PRODUTO, df["data_atual"].iloc[-1] - pd.Timedelta(days=1)):
+                monitor.salvar()
         if len(df) > 1:
             df = df.iloc[:-1]
             df.to_csv(caminho, index=False)
@@ -101,8 +109,10 @@ section[data-testid="stSidebar"] button[kind="primary"]:hover {
 st.title("Dashboard de Operações")
 
 # === FUNÇÕES DE CARREGAMENTO ===
-@st.cache_data
-def load_previsoes():
+# Os loaders recebem a assinatura (mtime, tamanho) do arquivo: quando a simulação
+# grava de novo, a chave muda e só aquele cache é recalculado.
+@st.cache_data(max_entries=4)
+def load_previsoes(assinatura):
     df = pd.read_csv("relatorio_previsoes.csv", sep=",")
     df.columns = df.columns.str.strip()
     df = df.rename(columns={
@@ -126,9 +136,15 @@ def load_previsoes():
     )
     return df
 
-@st.cache_data
-def load_estoque():
-    estoque = pd.read_csv("estado_estoque.csv", parse_dates=["data_atual"])
+@st.cache_resource
+def leitor_estoque():
+    # Histórico mantido entre execuções no formato compacto (dia int16, kg float32)
+    return LeitorCsvIncremental("estado_estoque.csv", converter=compactar_estado, parse_dates=["data_atual"])
+
+@st.cache_data(max_entries=4)
+def load_estoque(assinatura):
+    # Lê só as linhas anexadas desde a última carga
+    estoque = expandir_estado(leitor_estoque().ler())
     estoque["data_atual"] = estoque["data_atual"].dt.date  
     estoque = estoque.sort_values("data_atual")
     estoque["Perda Real"] = pd.to_numeric(estoque["perda_real"], errors="coerce").fillna(0)
@@ -142,8 +158,8 @@ modelo = carregar_modelo_ia()
 
     
 # === CARREGAMENTO DOS DADOS ===
-df = load_previsoes()
-estoque = load_estoque()
+df = load_previsoes(assinatura_arquivo("relatorio_previsoes.csv"))
+estoque = load_estoque(assinatura_arquivo("estado_estoque.csv"))
 
 
 # === FILTROS ===
@@ -156,17 +172,23 @@ dados_filtrados = df[(df["Data"].dt.date >= data_inicio) & (df["Data"].dt.date <
 estoque_filtrado = estoque[(estoque["data_atual"] >= data_inicio) & (estoque["data_atual"] <= data_fim)]
 
 if st.sidebar.button("Recarregar Dados"):
-    st.cache_data.clear()
+    load_previsoes.clear()
+    load_estoque.clear()
+    leitor_estoque.clear()
     st.rerun()
 
 st.sidebar.markdown("## Simulação")
+if st.session_state.pop("simulacao_executada", False):
+    st.sidebar.success("✅ Simulação executada com sucesso!")
 venda_real = st.sidebar.number_input("Venda Real do Dia (kg)", min_value=0.0, step=1.0, value=0.0)
+confirmar_venda = st.sidebar.checkbox("Confirmar venda fora do padrão")
 if st.sidebar.button("Executar Próximo Dia"):
-    sucesso = executar_simulacao_dashboard(venda_real)
+    sucesso = executar_simulacao_dashboard(venda_real, forcar=confirmar_venda)
     if sucesso:
-        st.success("✅ Simulação executada com sucesso! Atualize o dashboard para ver os novos dados.")
+        st.session_state.simulacao_executada = True
+        st.rerun()
     else:
-        st.error("❌ Ocorreu um erro ao executar a simulação.")
+        st.error("❌ Simulação não executada. Se a venda estiver muito fora do previsto, confira o valor ou marque a confirmação.")
 
 if st.sidebar.button("Resetar Última Simulação"):
     sucesso = resetar_simulacao()
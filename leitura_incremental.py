@@ -0,0 +1,80 @@
+# leitura_incremental.py
+# Leitura de CSVs que crescem por linhas anexadas (ex.: estado_estoque.csv).
+#
+# O leitor guarda o DataFrame já carregado e a posição em bytes onde parou. Se o
+# arquivo só cresceu (cabeçalho e final do trecho já lido continuam iguais), lê
+# apenas as linhas novas; se foi reescrito ou encolheu (reset de simulação),
+# recarrega tudo. Com 'converter', cada trecho lido é convertido antes de ser
+# guardado (ex.: modelo_dados.compactar_estado).
+import io
+import os
+import threading
+
+import pandas as pd
+
+JANELA_VERIFICACAO_BYTES = 1024
+
+
+def assinatura_arquivo(caminho: str):
+    # Usada como chave de cache: muda sempre que o arquivo é gravado
+    if not os.path.exists(caminho):
+        return None
+    info = os.stat(caminho)
+    return info.st_mtime_ns, info.st_size
+
+
+class LeitorCsvIncremental:
+    def __init__(self, caminho: str, converter=None, **opcoes_leitura):
+        self.caminho = caminho
+        self.converter = converter or (lambda df: df)
+        self.opcoes_leitura = opcoes_leitura
+        self._trava = threading.Lock()
+        self._limpar()
+
+    def _limpar(self):
+        self.df = None
+        self.colunas = None
+        self.posicao = 0
+        self.cabecalho = b''
+        self.cauda = b''
+
+    def _ainda_valido(self, arquivo, tamanho) -> bool:
+        if self.df is None or tamanho < self.posicao:
+            return False
+        arquivo.seek(0)
+        if arquivo.read(len(self.cabecalho)) != self.cabecalho:
+            return False
+        arquivo.seek(self.posicao - len(self.cauda))
+        return arquivo.read(len(self.cauda)) == self.cauda
+
+    def _registrar_posicao(self, arquivo, posicao):
+        self.posicao = posicao
+        inicio = max(0, posicao - JANELA_VERIFICACAO_BYTES)
+        arquivo.seek(inicio)
+        self.cauda = arquivo.read(posicao - inicio)
+
+    def ler(self) -> pd.DataFrame:
+        with self._trava:
+            tamanho = os.path.getsize(self.caminho)
+            with open(self.caminho, 'rb') as arquivo:
+                if self._ainda_valido(arquivo, tamanho):
+                    arquivo.seek(self.posicao)
+                    novos = arquivo.read(tamanho - self.posicao)
+                    # Ignora uma última linha ainda incompleta (gravação em andamento)
+                    novos = novos[:novos.rfind(b'\n') + 1]
+                    if novos.strip():
+                        df_novos = pd.read_csv(io.BytesIO(novos), header=None,
+                                               names=self.colunas, **self.opcoes_leitura)
+                        self.df = pd.concat([self.df, self.converter(df_novos)], ignore_index=True)
+                    self._registrar_posicao(arquivo, self.posicao + len(novos))
+                else:
+                    self._limpar()
+                    arquivo.seek(0)
+                    conteudo = arquivo.read()
+                    conteudo = conteudo[:conteudo.rfind(b'\n') + 1] or conteudo
+                    df = pd.read_csv(io.BytesIO(conteudo), **self.opcoes_leitura)
+                    self.colunas = list(df.columns)
+                    self.df = self.converter(df)
+                    self.cabecalho = conteudo.split(b'\n', 1)[0]
+                    self._registrar_posicao(arquivo, len(conteudo))
+            return self.df
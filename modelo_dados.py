@@ -0,0 +1,63 @@
+# modelo_dados.py
+# Representação compacta das previsões (cache e pool da API) e do histórico de
+# estado de estoque mantido em memória pelo dashboard.
+#
+# A saída do Prophet tem ~20 colunas float64 (tendência, sazonalidades, limites...),
+# mas a simulação, os relatórios e a API só usam ds, yhat e os limites do
+# intervalo. Aqui as tabelas ficam com:
+#   - 'dia': deslocamento inteiro (int16) em dias a partir de DATA_REFERENCIA, no lugar de Timestamps;
+#   - valores em float32 (precisão de sobra para kg);
+#   - sem coluna de SKU: cada tabela é guardada sob a chave (ou no arquivo) do seu SKU.
+# Para exibir ou exportar, expandir_estado devolve datas e float64 arredondado.
+import numpy as np
+import pandas as pd
+
+DATA_REFERENCIA = pd.Timestamp('2020-01-01')
+COLUNAS_PREVISAO = ['dia', 'yhat', 'yhat_lower', 'yhat_upper']
+CASAS_DECIMAIS_KG = 4   # o que o float32 guarda de fato; evita 134.4199981689453 nos CSVs e telas
+
+
+def data_para_dia(data) -> int:
+    return (pd.Timestamp(data).normalize() - DATA_REFERENCIA).days
+
+
+def dias_para_datas(dias) -> pd.Series:
+    return DATA_REFERENCIA + pd.to_timedelta(pd.Series(dias, dtype='int64'), unit='D')
+
+
+def _coluna_dias(datas) -> pd.Series:
+    datas = pd.to_datetime(datas).dt.normalize()
+    return ((datas - DATA_REFERENCIA) // pd.Timedelta(days=1)).astype(np.int16)
+
+
+def compactar_previsao(forecast: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame({
+        'dia': _coluna_dias(forecast['ds']).to_numpy(),
+        'yhat': forecast['yhat'].to_numpy(np.float32),
+        'yhat_lower': forecast['yhat_lower'].to_numpy(np.float32),
+        'yhat_upper': forecast['yhat_upper'].to_numpy(np.float32),
+    })
+
+
+def compactar_estado(df_estado: pd.DataFrame) -> pd.DataFrame:
+    compacta = pd.DataFrame({'dia': _coluna_dias(df_estado['data_atual']).to_numpy()})
+    for coluna in df_estado.columns.drop('data_atual'):
+        serie = df_estado[coluna]
+        compacta[coluna] = serie.to_numpy(np.float32) if pd.api.types.is_numeric_dtype(serie) else serie.to_numpy()
+    return compacta
+
+
+def expandir_estado(compacta: pd.DataFrame) -> pd.DataFrame:
+    df = compacta.drop(columns='dia')
+    for coluna in df.columns[df.dtypes == np.float32]:
+        df[coluna] = df[coluna].astype(np.float64).round(CASAS_DECIMAIS_KG)
+    df.insert(0, 'data_atual', dias_para_datas(compacta['dia']).to_numpy())
+    return df
+
+
+def valor_kg(valor) -> float:
+    return round(float(valor), CASAS_DECIMAIS_KG)
+
+
+def memoria_mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / 2 ** 20
@@ -0,0 +1,140 @@
+# monitor_vendas.py
+# Monitor contínuo das vendas reais informadas, por SKU.
+#
+# Para cada SKU guarda só um punhado de números (memória O(1)): média e variância
+# exponenciais (EWMA) da venda e as somas CUSUM do resíduo padronizado contra a
+# previsão do Prophet. Com isso:
+#   - anomalia: venda muito fora do intervalo previsto (yhat_lower/yhat_upper) e do
+#     comportamento recente; o valor não é registrado sem confirmação (ex.: 900 em vez de 90);
+#   - deriva: resíduos acumulados sempre para o mesmo lado; só nesse caso o modelo é reajustado.
+import json
+import math
+import os
+import tempfile
+
+from leitura_incremental import assinatura_arquivo
+
+ARQUIVO_MONITOR = 'monitor_vendas.json'
+ALFA_EWMA = 0.2
+Z_INTERVALO_PROPHET = 1.2816   # meia largura do intervalo padrão do Prophet (80%)
+LIMIAR_Z_ANOMALIA = 4.0
+MINIMO_OBSERVACOES = 5
+CUSUM_FOLGA = 0.5
+CUSUM_LIMIAR = 4.0
+MAXIMO_DESFAZER = 30
+
+
+def _estado_vazio():
+    return {'n': 0, 'media': 0.0, 'variancia': 0.0, 'cusum_alta': 0.0, 'cusum_baixa': 0.0}
+
+
+def venda_valida(venda_real) -> bool:
+    try:
+        return math.isfinite(float(venda_real)) and float(venda_real) >= 0
+    except (TypeError, ValueError):
+        return False
+
+
+def z_residuo(venda_real, yhat, yhat_lower, yhat_upper) -> float:
+    sigma = (yhat_upper - yhat_lower) / (2 * Z_INTERVALO_PROPHET)
+    if not sigma or sigma <= 0 or math.isnan(sigma):
+        return 0.0
+    return float((venda_real - yhat) / sigma)
+
+
+class MonitorVendas:
+    """Estatísticas móveis por SKU, persistidas em JSON entre execuções."""
+
+    def __init__(self, arquivo=ARQUIVO_MONITOR):
+        self.arquivo = arquivo
+        self.estados = {}
+        self.assinatura = None
+        self.recarregar()
+
+    def recarregar(self):
+        # Relê o arquivo quando outro processo o gravou (ex.: reset no dashboard)
+        if not self.arquivo:
+            return
+        assinatura = assinatura_arquivo(self.arquivo)
+        if assinatura == self.assinatura:
+            return
+        estados = {}
+        if os.path.exists(self.arquivo):
+            with open(self.arquivo, encoding='utf-8') as f:
+                estados = json.load(f)
+        self.estados = estados
+        self.assinatura = assinatura
+
+    def salvar(self):
+        if not self.arquivo:
+            return
+        # Grava num temporário e troca de uma vez: o dashboard e a API nunca leem o JSON pela metade
+        pasta = os.path.dirname(os.path.abspath(self.arquivo))
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=pasta, suffix='.tmp', delete=False) as f:
+            json.dump(self.estados, f, indent=2)
+        os.replace(f.name, self.arquivo)
+        self.assinatura = assinatura_arquivo(self.arquivo)
+
+    def _estado(self, sku):
+        return self.estados.setdefault(str(sku), _estado_vazio())
+
+    def avaliar(self, sku, venda_real, yhat, yhat_lower, yhat_upper) -> dict:
+        # Apenas verifica a venda; não altera as estatísticas
+        if not venda_valida(venda_real):
+            return {'anomalia': True, 'valida': False, 'z_previsao': None, 'z_ewma': None}
+        estado = self.estados.get(str(sku), _estado_vazio())
+        z_prev = z_residuo(venda_real, yhat, yhat_lower, yhat_upper)
+        if estado['n'] >= MINIMO_OBSERVACOES and estado['variancia'] > 0:
+            z_ewma = float((venda_real - estado['media']) / math.sqrt(estado['variancia']))
+        else:
+            z_ewma = None
+        # Fora do intervalo previsto e, quando já há histórico, também fora do padrão recente
+        anomalia = bool(abs(z_prev) > LIMIAR_Z_ANOMALIA and (z_ewma is None or abs(z_ewma) > LIMIAR_Z_ANOMALIA))
+        return {'anomalia': anomalia, 'valida': True, 'z_previsao': z_prev, 'z_ewma': z_ewma}
+
+    def registrar(self, sku, venda_real, yhat, yhat_lower, yhat_upper, data=None) -> dict:
+        resultado = self.avaliar(sku, venda_real, yhat, yhat_lower, yhat_upper)
+        if not resultado['valida']:
+            # Negativos, NaN e infinitos nunca entram na EWMA/CUSUM, nem confirmados
+            raise ValueError(f"Venda inválida para o monitor: {venda_real!r}")
+        estado = self._estado(sku)
+        # Guarda as estatísticas anteriores para desfazer (reset da última rodada)
+        anterior = {chave: valor for chave, valor in estado.items() if chave != 'anteriores'}
+        anterior['data'] = None if data is None else str(data)[:10]
+        estado['anteriores'] = (estado.get('anteriores', []) + [anterior])[-MAXIMO_DESFAZER:]
+
+        venda_real = float(venda_real)
+        if estado['n'] == 0:
+            estado['media'] = venda_real
+        else:
+            diferenca = venda_real - estado['media']
+            incremento = ALFA_EWMA * diferenca
+            estado['media'] += incremento
+            estado['variancia'] = (1 - ALFA_EWMA) * (estado['variancia'] + diferenca * incremento)
+        estado['n'] += 1
+
+        # Um único valor extremo não deve sozinho disparar a deriva
+        z = max(-LIMIAR_Z_ANOMALIA, min(LIMIAR_Z_ANOMALIA, resultado['z_previsao']))
+        estado['cusum_alta'] = max(0.0, estado['cusum_alta'] + z - CUSUM_FOLGA)
+        estado['cusum_baixa'] = max(0.0, estado['cusum_baixa'] - z - CUSUM_FOLGA)
+
+        resultado['deriva'] = bool(max(estado['cusum_alta'], estado['cusum_baixa']) > CUSUM_LIMIAR)
+        resultado['reajustar'] = resultado['deriva']
+        return resultado
+
+    def desfazer(self, sku, data=None) -> bool:
+        # Volta ao estado anterior ao último registrar(); com 'data', só se for a venda desse dia
+        estado = self.estados.get(str(sku))
+        if not estado or not estado.get('anteriores'):
+            return False
+        if data is not None and estado['anteriores'][-1]['data'] != str(data)[:10]:
+            return False
+        anterior = estado['anteriores'].pop()
+        anterior.pop('data')
+        estado.update(anterior)
+        return True
+
+    def confirmar_reajuste(self, sku):
+        estado = self._estado(sku)
+        estado['cusum_alta'] = 0.0
+        estado['cusum_baixa'] = 0.0
@@ -0,0 +1,283 @@
+# planejamento_descongelamento.py
+# Planejamento de vários dias da retirada de caixas do congelado para descongelar.
+#
+# Para cada SKU escolhe quantas caixas inteiras retirar em cada dia do horizonte,
+# considerando o estoque congelado disponível, as previsões, o prazo de
+# descongelamento e a validade na prateleira. A sobra do arredondamento em caixas
+# não é perdida: ela segue como lote do dia anterior e reduz a retirada seguinte.
+#
+# A validade é fixa em 2 dias, como na esteira do simulador (kg_pronto_venda_dia1 e
+# kg_pronto_venda_dia2): em cada dia há só o lote novo e o lote antigo, que vira perda
+# no fim do dia. _vender_dia e o estado do DP dependem disso.
+#
+# O problema é resolvido por programação dinâmica sobre o dia de chegada do lote.
+# Estado: (sobra do lote que entra no último dia de validade, discretizada em
+# RESOLUCAO_SOBRA_KG, e caixas já usadas). Estados dominados (mais caixas usadas e
+# custo maior ou igual para a mesma sobra) são descartados, e cada dia mantém no
+# máximo MAXIMO_ESTADOS_POR_DIA estados. Em lote, os SKUs rodam dentro de um orçamento de
+# tempo; os que não couberem recebem o plano guloso (regra diária atual).
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from datetime import timedelta
+
+import pandas as pd
+
+from projeto2 import DIAS_VALIDADE_PRATELEIRA
+from simulador import (PESO_CAIXA_KG, carregar_dados_treino_por_sku, obter_previsao, previsao_em_cache,
+                       previsao_do_dia, carregar_estado_atual, arquivo_estado,
+                       carregar_cache_previsoes, salvar_cache_previsoes)
+
+assert DIAS_VALIDADE_PRATELEIRA == 2, "o planejamento só modela lotes com 2 dias de validade"
+
+# Esteira do simulador: retirado hoje -> kg_descongelando_d1 -> kg_descongelando_d2 -> kg_pronto_venda_dia1
+PRAZO_DESCONGELAMENTO_DIAS = 3       # retirado hoje, vendido a partir de D+3
+HORIZONTE_PLANEJAMENTO_DIAS = 7
+CUSTO_PERDA_KG = 12.50               # produto descartado (mesmo valor do dashboard)
+CUSTO_FALTA_KG = 15.00               # venda perdida por falta de produto
+RESOLUCAO_SOBRA_KG = 0.1
+MAXIMO_ESTADOS_POR_DIA = 2000
+ORCAMENTO_SEGUNDOS = 600.0
+ARQUIVO_ESTOQUE_CONGELADO = 'estoque_congelado.csv'
+ARQUIVO_PLANO_DESCONGELAMENTO = 'plano_descongelamento.csv'
+
+
+def _vender_dia(demanda, lote_antigo, lote_novo):
+    # Venda FIFO: o lote antigo (último dia de validade) sai primeiro e o que sobrar dele é perda
+    venda_antigo = min(demanda, lote_antigo)
+    perda = lote_antigo - venda_antigo
+    restante = demanda - venda_antigo
+    venda_novo = min(restante, lote_novo)
+    falta = restante - venda_novo
+    return perda, falta, lote_novo - venda_novo
+
+
+def _custo(perda, falta):
+    return perda * CUSTO_PERDA_KG + falta * CUSTO_FALTA_KG
+
+
+def avaliar_plano(chegadas_caixas, demanda, sobra_inicial, chegadas_programadas):
+    # Simula o horizonte com as caixas que chegam em cada dia; devolve custo e detalhes diários
+    sobra = sobra_inicial
+    custo_total = 0.0
+    dias = []
+    for s, d in enumerate(demanda):
+        chegada = chegadas_programadas[s] + chegadas_caixas[s] * PESO_CAIXA_KG
+        perda, falta, sobra = _vender_dia(d, sobra, chegada)
+        custo_total += _custo(perda, falta)
+        dias.append({'perda_kg': perda, 'falta_kg': falta, 'sobra_kg': sobra})
+    return custo_total, dias
+
+
+def _limite_caixas(demanda, s):
+    # Mais do que a demanda dos dias de validade do lote é perda certa
+    janela = sum(demanda[s:s + DIAS_VALIDADE_PRATELEIRA])
+    return math.ceil(max(0.0, janela) / PESO_CAIXA_KG) + 1
+
+
+def plano_guloso(demanda, sobra_inicial, chegadas_programadas, caixas_congeladas=None):
+    # Regra diária atual: cobre a previsão do dia de chegada descontando a sobra, arredondando para cima
+    horizonte = len(demanda)
+    chegadas = [0] * horizonte
+    disponiveis = math.inf if caixas_congeladas is None else caixas_congeladas
+    sobra = sobra_inicial
+    for s, d in enumerate(demanda):
+        if s >= PRAZO_DESCONGELAMENTO_DIAS:
+            necessario = max(0.0, d - sobra - chegadas_programadas[s])
+            chegadas[s] = min(math.ceil(necessario / PESO_CAIXA_KG), disponiveis)
+            disponiveis -= chegadas[s]
+        _, _, sobra = _vender_dia(d, sobra, chegadas_programadas[s] + chegadas[s] * PESO_CAIXA_KG)
+    return chegadas
+
+
+def plano_otimo(demanda, sobra_inicial, chegadas_programadas, caixas_congeladas=None):
+    horizonte = len(demanda)
+    disponiveis = math.inf if caixas_congeladas is None else caixas_congeladas
+    # (sobra discretizada, caixas usadas) -> (custo, sobra em kg, caixas por dia de chegada)
+    estados = {(round(sobra_inicial / RESOLUCAO_SOBRA_KG), 0): (0.0, sobra_inicial, ())}
+    for s, d in enumerate(demanda):
+        opcoes = range(0, _limite_caixas(demanda, s) + 1) if s >= PRAZO_DESCONGELAMENTO_DIAS else (0,)
+        demanda_amanha = demanda[s + 1] if s + 1 < horizonte else 0.0
+        proximos = {}
+        for (_, usadas), (custo, sobra, caminho) in estados.items():
+            for caixas in opcoes:
+                if usadas + caixas > disponiveis:
+                    break
+                chegada = chegadas_programadas[s] + caixas * PESO_CAIXA_KG
+                perda, falta, nova_sobra = _vender_dia(d, sobra, chegada)
+                novo_custo = custo + _custo(perda, falta)
+                # Sem limite de congelado, as caixas usadas não diferenciam estados
+                chave = (round(nova_sobra / RESOLUCAO_SOBRA_KG), usadas + caixas if caixas_congeladas is not None else 0)
+                if chave not in proximos or novo_custo < proximos[chave][0]:
+                    proximos[chave] = (novo_custo, nova_sobra, caminho + (caixas,))
+                if falta == 0 and nova_sobra >= demanda_amanha:
+                    break  # sem falta hoje e a sobra já cobre amanhã: mais caixas só viram perda
+        estados = _podar(proximos)
+    _, _, caminho = min(estados.values(), key=lambda v: (v[0], sum(v[2])))
+    return list(caminho) + [0] * (horizonte - len(caminho))
+
+
+def _podar(estados):
+    # Para a mesma sobra, só vale manter quem usa mais caixas se o custo for menor
+    por_sobra = {}
+    for (sobra, usadas), valor in sorted(estados.items(), key=lambda item: item[0]):
+        melhores = por_sobra.setdefault(sobra, [])
+        if not melhores or valor[0] < melhores[-1][1][0]:
+            melhores.append(((sobra, usadas), valor))
+    podados = [item for melhores in por_sobra.values() for item in melhores]
+    if len(podados) > MAXIMO_ESTADOS_POR_DIA:
+        podados = sorted(podados, key=lambda item: item[1][0])[:MAXIMO_ESTADOS_POR_DIA]
+    return dict(podados)
+
+
+def planejar_sku(entrada: dict, prazo_final: float = None) -> pd.DataFrame:
+    """Monta o plano de um SKU.
+
+    `entrada` tem: sku, data_inicio, demanda (kg/dia a partir de data_inicio),
+    lote_antigo e lote_novo (kg prontos hoje), chegadas_programadas (kg que já estão
+    descongelando, por dia a partir de amanhã) e caixas_congeladas (None = sem limite).
+    """
+    demanda = [max(0.0, float(d)) for d in entrada['demanda']]
+    horizonte = len(demanda)
+    programadas = list(entrada.get('chegadas_programadas', []))
+    programadas = ([entrada.get('lote_novo', 0.0)] + programadas + [0.0] * horizonte)[:horizonte]
+    sobra_inicial = entrada.get('lote_antigo', 0.0)
+    caixas_congeladas = entrada.get('caixas_congeladas')
+
+    metodo = 'otimo'
+    if prazo_final is not None and time.time() > prazo_final:
+        metodo = 'guloso'
+        chegadas = plano_guloso(demanda, sobra_inicial, programadas, caixas_congeladas)
+    else:
+        chegadas = plano_otimo(demanda, sobra_inicial, programadas, caixas_congeladas)
+    custo, dias = avaliar_plano(chegadas, demanda, sobra_inicial, programadas)
+
+    linhas = []
+    for s in range(horizonte - PRAZO_DESCONGELAMENTO_DIAS):
+        chegada = s + PRAZO_DESCONGELAMENTO_DIAS
+        caixas = chegadas[chegada]
+        linhas.append({
+            'sku': str(entrada['sku']),
+            'data_retirada': entrada['data_inicio'] + timedelta(days=s),
+            'data_pronto_venda': entrada['data_inicio'] + timedelta(days=chegada),
+            'caixas_a_retirar': caixas,
+            'kg_a_retirar': round(caixas * PESO_CAIXA_KG, 2),
+            'demanda_prevista_kg': round(demanda[chegada], 2),
+            'perda_projetada_kg': round(dias[chegada]['perda_kg'], 2),
+            'falta_projetada_kg': round(dias[chegada]['falta_kg'], 2),
+            'sobra_projetada_kg': round(dias[chegada]['sobra_kg'], 2),
+            'custo_horizonte': round(custo, 2),
+            'metodo': metodo,
+        })
+    return pd.DataFrame(linhas)
+
+
+def _planejar_bloco(argumentos):
+    entradas, prazo_final = argumentos
+    return [planejar_sku(entrada, prazo_final) for entrada in entradas]
+
+
+def planejar_todos(entradas: list, orcamento_segundos: float = ORCAMENTO_SEGUNDOS, processos: int = 1,
+                   executor=None) -> pd.DataFrame:
+    prazo_final = time.time() + orcamento_segundos
+    if (processos > 1 or executor is not None) and len(entradas) > 1:
+        tamanho = math.ceil(len(entradas) / (processos * 4))
+        blocos = [(entradas[i:i + tamanho], prazo_final) for i in range(0, len(entradas), tamanho)]
+        contexto = nullcontext(executor) if executor is not None else ProcessPoolExecutor(max_workers=processos)
+        with contexto as executor:
+            planos = [plano for bloco in executor.map(_planejar_bloco, blocos) for plano in bloco]
+    else:
+        planos = _planejar_bloco((entradas, prazo_final))
+    planos = [plano for plano in planos if not plano.empty]
+    return pd.concat(planos, ignore_index=True) if planos else pd.DataFrame()
+
+
+# --- INTEGRAÇÃO COM A SIMULAÇÃO ---
+
+def carregar_estoque_congelado(arquivo: str = ARQUIVO_ESTOQUE_CONGELADO) -> dict:
+    # CSV com colunas 'sku' e 'caixas'; sem o arquivo, o congelado é tratado como ilimitado
+    if not os.path.exists(arquivo):
+        return {}
+    df = pd.read_csv(arquivo, dtype={'sku': str})
+    return dict(zip(df['sku'], df['caixas'].astype(int)))
+
+
+def _data_atual_estado(sku, data_hoje):
+    # Dia atual do estado sem precisar da previsão (que só é usada para criar um estado novo)
+    arquivo = arquivo_estado(sku)
+    if not os.path.exists(arquivo):
+        return data_hoje
+    return pd.read_csv(arquivo, usecols=['data_atual'], parse_dates=['data_atual'])['data_atual'].iloc[-1]
+
+
+def _ajustar_previsao(argumentos):
+    # Roda num processo do pool e devolve a entrada de cache do SKU
+    sku, df_prophet, data_minima = argumentos
+    cache = {}
+    obter_previsao(df_prophet, sku=sku, data_minima=data_minima, cache=cache)
+    return cache
+
+
+def preparar_previsoes(dados: dict, cache: dict, executor=None) -> int:
+    # Ajusta só as previsões ausentes do cache ou que não cobrem o horizonte de cada SKU
+    pendentes = []
+    for sku, df_prophet in dados.items():
+        data_hoje = df_prophet['ds'].max() + timedelta(days=1)
+        data_minima = _data_atual_estado(sku, data_hoje) + timedelta(days=HORIZONTE_PLANEJAMENTO_DIAS)
+        if previsao_em_cache(cache, df_prophet, sku, data_minima) is None:
+            pendentes.append((sku, df_prophet, data_minima))
+    ajustadas = executor.map(_ajustar_previsao, pendentes) if executor is not None else map(_ajustar_previsao, pendentes)
+    for entrada in ajustadas:
+        cache.update(entrada)
+    return len(pendentes)
+
+
+def montar_entrada(sku, estado: pd.Series, forecast: pd.DataFrame, caixas_congeladas=None,
+                   horizonte: int = HORIZONTE_PLANEJAMENTO_DIAS) -> dict:
+    hoje = estado['data_atual']
+    # Lotes já retirados, um por dia da esteira antes do primeiro lote novo (D+1 .. D+PRAZO-1)
+    programadas = [estado.get('kg_descongelando_d2', estado.get('kg_em_descongelamento', 0.0)),
+                   estado.get('kg_descongelando_d1', 0.0)][:PRAZO_DESCONGELAMENTO_DIAS - 1]
+    return {
+        'sku': sku,
+        'data_inicio': hoje,
+        'demanda': [previsao_do_dia(forecast, hoje + timedelta(days=s)) for s in range(horizonte)],
+        'lote_antigo': float(estado['kg_pronto_venda_dia2']),
+        'lote_novo': float(estado['kg_pronto_venda_dia1']),
+        'chegadas_programadas': [0.0 if pd.isna(kg) else float(kg) for kg in programadas],
+        'caixas_congeladas': caixas_congeladas,
+    }
+
+
+if __name__ == "__main__":
+    print("--- Planejamento de Descongelamento (caixas) ---")
+    inicio = time.time()
+    processos = os.cpu_count() or 1
+    # 'dados.csv' é lido uma vez só e separado por SKU
+    dados = {sku: df for sku, df in carregar_dados_treino_por_sku().items() if not df.empty}
+    skus = list(dados)
+    congelado = carregar_estoque_congelado()
+    # O cache de previsões é lido e gravado uma vez só, não a cada SKU
+    cache = carregar_cache_previsoes()
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        ajustadas = preparar_previsoes(dados, cache, executor)
+        salvar_cache_previsoes(cache)
+        entradas = []
+        for sku, df_prophet in dados.items():
+            data_hoje = df_prophet['ds'].max() + timedelta(days=1)
+            forecast = obter_previsao(df_prophet, sku=sku, cache=cache)
+            estado = carregar_estado_atual(forecast, data_hoje, arquivo_estado(sku))
+            entradas.append(montar_entrada(sku, estado, forecast, congelado.get(sku)))
+
+        # As previsões também contam no orçamento: o DP fica com o tempo que sobrou
+        restante = ORCAMENTO_SEGUNDOS - (time.time() - inicio)
+        print(f" Previsões de {len(skus)} SKU(s) ({ajustadas} ajustada(s)) em {time.time() - inicio:.1f}s; "
+              f"{max(0.0, restante):.1f}s para o planejamento.")
+        plano = planejar_todos(entradas, restante, processos=processos, executor=executor)
+    plano.to_csv(ARQUIVO_PLANO_DESCONGELAMENTO, index=False)
+    print(plano[['sku', 'data_retirada', 'caixas_a_retirar', 'kg_a_retirar', 'demanda_prevista_kg',
+                 'perda_projetada_kg', 'falta_projetada_kg', 'metodo']].to_string(index=False))
+    print(f"\n✅ Plano de {len(skus)} SKU(s) salvo em '{ARQUIVO_PLANO_DESCONGELAMENTO}' "
+          f"({time.time() - inicio:.1f}s).")
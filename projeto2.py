@@ -1,6 +1,7 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 from prophet import Prophet
+from ajuste_prophet import carregar_melhores_parametros
 import math
 import numpy as np
 from datetime import datetime, timedelta
@@ -139,8 +140,8 @@ if __name__ == "__main__":
         print("\n Carregando dados de treino..."); df = pd.read_csv(ARQUIVO_DADOS_TREINO, sep=',', decimal=',', thousands='.', parse_dates=['data_dia'])
         df_prophet = df.rename(columns={'data_dia': 'ds', 'total_venda_dia_kg': 'y'}); df_prophet.dropna(subset=['ds'], inplace=True)
         
-        print(" Treinando o modelo Prophet..."); modelo = Prophet(); modelo.fit(df_prophet)
-        future = modelo.make_future_dataframe(periods=30); forecast = modelo.predict(future); print(" Modelo treinado e previsão gerada.")
+        print(" Treinando o modelo Prophet..."); modelo = Prophet(**carregar_melhores_parametros(SKU_PRODUTO)); modelo.fit(df_prophet)
+        future = modelo.make_future_dataframe(periods=30); forecast = modelo.predict(future)[['ds', 'yhat', 'yhat_lower', 'yhat_upper']]; print(" Modelo treinado e previsão gerada.")
         
         ultima_data_real = df_prophet['ds'].max(); data_de_partida = ultima_data_real + timedelta(days=1)
         
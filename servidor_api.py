@@ -0,0 +1,389 @@
+# servidor_api.py
+# API HTTP local (somente asyncio da biblioteca padrão) para integração com o PDV.
+#
+#   POST /vendas          {"sku": "384706", "data": "2025-07-03", "venda_real": 118.5, "forcar": false}
+#   GET  /recomendacao    ?sku=384706
+#   GET  /previsoes       ?sku=384706&dias=7
+#
+# Os modelos Prophet ajustados ficam num pool LRU em memória (um por SKU), e as
+# vendas que chegam juntas (fechamento da loja) são agrupadas em lotes antes de
+# gravar o estado em disco. A 'data' da venda precisa ser o dia atual do SKU
+# (o 'data' de /recomendacao): reenvios e duplicatas do PDV recebem 409.
+import asyncio
+import copy
+import json
+import math
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit, parse_qs
+
+import pandas as pd
+
+from simulador import (
+    SKU_PRODUTO, PESO_CAIXA_KG,
+    carregar_dados_treino, treinar_e_prever, previsao_do_dia, arquivo_estado,
+    carregar_estado_atual, calcular_rodada, registrar_estados,
+    anexar_vendas_registradas, intervalo_do_dia,
+)
+from monitor_vendas import MonitorVendas, venda_valida
+from modelo_dados import compactar_previsao, data_para_dia, dias_para_datas
+from leitura_incremental import assinatura_arquivo
+
+HOST = os.environ.get('API_HOST', '127.0.0.1')
+PORTA = int(os.environ.get('API_PORTA', '8000'))
+CAPACIDADE_POOL_MODELOS = 32
+JANELA_LOTE_SEGUNDOS = 0.05
+TAMANHO_MAXIMO_LOTE = 256
+TAMANHO_MAXIMO_CORPO = 64 * 1024
+DIAS_MINIMOS_PREVISAO = 7      # a partir do dia atual do estado (rodada usa D+2, /previsoes usa 7 por padrão)
+
+STATUS_HTTP = {200: 'OK', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found',
+               405: 'Method Not Allowed', 409: 'Conflict', 413: 'Payload Too Large', 422: 'Unprocessable Entity',
+               500: 'Internal Server Error'}
+
+
+class ErroRequisicao(Exception):
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+        self.mensagem = mensagem
+
+
+# --- POOL DE MODELOS ---
+
+class PoolModelos:
+    """Cache LRU de modelos ajustados por SKU, com o estado de estoque corrente."""
+
+    def __init__(self, capacidade=CAPACIDADE_POOL_MODELOS):
+        self.capacidade = capacidade
+        self._entradas = OrderedDict()
+        self._travas = {}
+
+    def _trava(self, sku):
+        if sku not in self._travas:
+            self._travas[sku] = asyncio.Lock()
+        return self._travas[sku]
+
+    def _valida(self, sku):
+        entrada = self._entradas.get(sku)
+        if entrada is None or not _previsao_cobre(_atualizar_estado(sku, entrada)):
+            return None
+        return entrada
+
+    async def obter(self, sku):
+        entrada = self._valida(sku)
+        if entrada is not None:
+            self._entradas.move_to_end(sku)
+            return entrada
+        # Uma trava por SKU evita dois ajustes simultâneos do mesmo modelo
+        async with self._trava(sku):
+            entrada = self._valida(sku)
+            if entrada is None:
+                # Modelo novo ou previsão que já não cobre os próximos dias do estado
+                loop = asyncio.get_running_loop()
+                entrada = await loop.run_in_executor(None, _ajustar_entrada, sku)
+                self._entradas[sku] = entrada
+                while len(self._entradas) > self.capacidade:
+                    sku_antigo, _ = self._entradas.popitem(last=False)
+                    self._travas.pop(sku_antigo, None)
+            self._entradas.move_to_end(sku)
+            return entrada
+
+    def descartar(self, sku):
+        self._entradas.pop(sku, None)
+
+
+def _ajustar_entrada(sku):
+    df_prophet = carregar_dados_treino(sku)
+    if df_prophet.empty:
+        raise ErroRequisicao(404, f"SKU '{sku}' sem histórico de vendas.")
+    df_treino = anexar_vendas_registradas(df_prophet, arquivo_estado(sku))
+    modelo, forecast = treinar_e_prever(df_treino, sku=sku)
+    forecast = compactar_previsao(forecast)
+    data_hoje = df_prophet['ds'].max() + timedelta(days=1)
+    entrada = {'modelo': modelo, 'forecast': forecast, 'data_hoje': data_hoje, 'assinatura_estado': None}
+    return _atualizar_estado(sku, entrada)
+
+
+def _previsao_cobre(entrada) -> bool:
+    ultimo_dia = entrada['estado']['data_atual'] + timedelta(days=DIAS_MINIMOS_PREVISAO)
+    return entrada['forecast']['dia'].max() >= data_para_dia(ultimo_dia)
+
+
+def _atualizar_estado(sku, entrada):
+    # O dashboard e o simulador gravam no mesmo arquivo de estado: relê a última
+    # linha sempre que o arquivo mudou desde a última leitura ou gravação do pool
+    arquivo = arquivo_estado(sku)
+    assinatura = assinatura_arquivo(arquivo)
+    if 'estado' not in entrada or assinatura != entrada['assinatura_estado']:
+        entrada['estado'] = carregar_estado_atual(entrada['forecast'], entrada['data_hoje'], arquivo)
+        entrada['assinatura_estado'] = assinatura
+    return entrada
+
+
+# --- REGRAS DE NEGÓCIO ---
+
+def recomendacao(entrada):
+    # Sem a venda real do dia, assume a venda prevista para projetar a sobra
+    estado = entrada['estado']
+    forecast = entrada['forecast']
+    hoje = estado['data_atual']
+    venda_prevista = max(0, previsao_do_dia(forecast, hoje))
+    proximo = calcular_rodada(estado, forecast, venda_prevista)
+    kg = proximo['kg_descongelando_d1']
+    return {
+        'data': hoje.strftime('%Y-%m-%d'),
+        'kg_a_descongelar': round(float(kg), 2),
+        'caixas_a_retirar': math.ceil(kg / PESO_CAIXA_KG),
+        'venda_prevista_hoje': round(float(venda_prevista), 2),
+        'kg_pronto_venda_hoje': round(float(estado['kg_pronto_venda_dia1'] + estado['kg_pronto_venda_dia2']), 2),
+    }
+
+
+def previsoes(entrada, dias):
+    forecast = entrada['forecast']
+    inicio = entrada['estado']['data_atual']
+    futuras = forecast[forecast['dia'] >= data_para_dia(inicio)].head(dias)
+    return [
+        {'ds': data.strftime('%Y-%m-%d'), 'yhat': round(float(linha.yhat), 2),
+         'yhat_lower': round(float(linha.yhat_lower), 2), 'yhat_upper': round(float(linha.yhat_upper), 2)}
+        for data, linha in zip(dias_para_datas(futuras['dia']), futuras.itertuples())
+    ]
+
+
+# --- LOTES DE VENDAS ---
+
+class ProcessadorLotes:
+    """Agrupa as vendas recebidas numa janela curta e grava um lote por SKU."""
+
+    def __init__(self, pool, monitor=None, janela=JANELA_LOTE_SEGUNDOS, tamanho_maximo=TAMANHO_MAXIMO_LOTE):
+        self.pool = pool
+        self.monitor = monitor or MonitorVendas()
+        self.janela = janela
+        self.tamanho_maximo = tamanho_maximo
+        self._fila = asyncio.Queue()
+        self._tarefa = None
+
+    def iniciar(self):
+        self._tarefa = asyncio.create_task(self._executar())
+
+    async def parar(self):
+        if self._tarefa:
+            self._tarefa.cancel()
+            try:
+                await self._tarefa
+            except asyncio.CancelledError:
+                pass
+
+    async def enviar(self, sku, venda_real, data, forcar=False):
+        futuro = asyncio.get_running_loop().create_future()
+        await self._fila.put((sku, venda_real, data, forcar, futuro))
+        return await futuro
+
+    async def _coletar_lote(self):
+        lote = [await self._fila.get()]
+        limite = asyncio.get_running_loop().time() + self.janela
+        while len(lote) < self.tamanho_maximo:
+            restante = limite - asyncio.get_running_loop().time()
+            if restante <= 0:
+                break
+            try:
+                lote.append(await asyncio.wait_for(self._fila.get(), restante))
+            except asyncio.TimeoutError:
+                break
+        return lote
+
+    async def _executar(self):
+        while True:
+            lote = await self._coletar_lote()
+            # Uma falha (ex.: monitor_vendas.json ilegível) responde o lote com erro sem parar a tarefa
+            try:
+                # O dashboard pode ter desfeito rodadas no arquivo do monitor
+                self.monitor.recarregar()
+                por_sku = OrderedDict()
+                for sku, venda_real, data, forcar, futuro in lote:
+                    por_sku.setdefault(sku, []).append((venda_real, data, forcar, futuro))
+                await asyncio.gather(*(self._processar_sku(sku, itens) for sku, itens in por_sku.items()))
+                # Uma gravação por lote, sem outra corrotina alterando o monitor durante o json.dump
+                await asyncio.get_running_loop().run_in_executor(None, self.monitor.salvar)
+            except Exception as e:
+                for *_, futuro in lote:
+                    if not futuro.done():
+                        futuro.set_exception(e)
+
+    async def _processar_sku(self, sku, itens):
+        monitor_anterior = copy.deepcopy(self.monitor.estados.get(sku))
+        gravado = False
+        try:
+            entrada = await self.pool.obter(sku)
+            # Vendas do mesmo SKU no lote são aplicadas em sequência (dias consecutivos)
+            estado = entrada['estado']
+            aceitos = []
+            reajustar = False
+            for venda_real, data, forcar, futuro in itens:
+                intervalo = intervalo_do_dia(entrada['forecast'], estado['data_atual'])
+                if not venda_valida(venda_real):
+                    futuro.set_exception(ErroRequisicao(400, f"Venda inválida: {venda_real!r}."))
+                    continue
+                if data != estado['data_atual'].normalize():
+                    futuro.set_exception(ErroRequisicao(
+                        409, f"Venda de {data:%Y-%m-%d} não é do dia atual do SKU "
+                             f"({estado['data_atual']:%Y-%m-%d}); já registrada ou fora de ordem."))
+                    continue
+                if intervalo is not None:
+                    if self.monitor.avaliar(sku, venda_real, *intervalo)['anomalia'] and not forcar:
+                        futuro.set_exception(ErroRequisicao(
+                            422, f"Venda de {venda_real:.2f} kg fora do padrão (previsto "
+                                 f"{intervalo[1]:.2f}–{intervalo[2]:.2f} kg). Reenvie com 'forcar': true para confirmar."))
+                        continue
+                    reajustar = self.monitor.registrar(sku, venda_real, *intervalo,
+                                                      data=estado['data_atual'])['reajustar'] or reajustar
+                novo = calcular_rodada(estado, entrada['forecast'], venda_real)
+                novo['venda_real'] = venda_real
+                aceitos.append((novo, futuro))
+                estado = pd.Series(novo)
+
+            loop = asyncio.get_running_loop()
+            if aceitos:
+                await loop.run_in_executor(None, registrar_estados, [novo for novo, _ in aceitos], arquivo_estado(sku))
+                gravado = True
+                entrada['assinatura_estado'] = assinatura_arquivo(arquivo_estado(sku))
+            entrada['estado'] = estado
+            if reajustar:
+                # O próximo acesso ao SKU ajusta o modelo de novo, já com as vendas registradas
+                self.monitor.confirmar_reajuste(sku)
+                self.pool.descartar(sku)
+
+            for novo, futuro in aceitos:
+                if not futuro.done():
+                    futuro.set_result({
+                        'sku': sku,
+                        'proximo_dia': novo['data_atual'].strftime('%Y-%m-%d'),
+                        'kg_a_descongelar': round(float(novo['kg_descongelando_d1']), 2),
+                        'caixas_a_retirar': math.ceil(novo['kg_descongelando_d1'] / PESO_CAIXA_KG),
+                        'reajuste_modelo': reajustar,
+                    })
+        except Exception as e:
+            if not gravado:
+                # As vendas não chegaram ao arquivo de estado: o monitor também não deve contá-las
+                if monitor_anterior is None:
+                    self.monitor.estados.pop(sku, None)
+                else:
+                    self.monitor.estados[sku] = monitor_anterior
+            for *_, futuro in itens:
+                if not futuro.done():
+                    futuro.set_exception(e)
+
+
+# --- HTTP ---
+
+async def _ler_requisicao(reader):
+    linha = await reader.readline()
+    if not linha:
+        return None
+    try:
+        metodo, alvo, _ = linha.decode('latin-1').split(' ', 2)
+    except ValueError:
+        raise ErroRequisicao(400, 'Linha de requisição inválida.')
+    cabecalhos = {}
+    while True:
+        linha = await reader.readline()
+        if linha in (b'\r\n', b'\n', b''):
+            break
+        nome, _, valor = linha.decode('latin-1').partition(':')
+        cabecalhos[nome.strip().lower()] = valor.strip()
+    try:
+        tamanho = int(cabecalhos.get('content-length', 0) or 0)
+    except ValueError:
+        raise ErroRequisicao(400, 'Content-Length inválido.')
+    if tamanho < 0:
+        raise ErroRequisicao(400, 'Content-Length inválido.')
+    if tamanho > TAMANHO_MAXIMO_CORPO:
+        raise ErroRequisicao(413, 'Corpo da requisição muito grande.')
+    try:
+        corpo = await reader.readexactly(tamanho) if tamanho else b''
+    except asyncio.IncompleteReadError:
+        raise ErroRequisicao(400, 'Corpo da requisição incompleto.')
+    return metodo.upper(), alvo, corpo
+
+
+def _resposta(status, dados):
+    corpo = json.dumps(dados, ensure_ascii=False).encode('utf-8')
+    cabecalho = (f"HTTP/1.1 {status} {STATUS_HTTP.get(status, '')}\r\n"
+                 "Content-Type: application/json; charset=utf-8\r\n"
+                 f"Content-Length: {len(corpo)}\r\n"
+                 "Connection: close\r\n\r\n")
+    return cabecalho.encode('latin-1') + corpo
+
+
+class ServidorAPI:
+    def __init__(self, pool=None):
+        self.pool = pool or PoolModelos()
+        self.lotes = ProcessadorLotes(self.pool)
+
+    async def rotear(self, metodo, alvo, corpo):
+        url = urlsplit(alvo)
+        parametros = {chave: valores[-1] for chave, valores in parse_qs(url.query).items()}
+
+        if url.path == '/vendas':
+            if metodo != 'POST':
+                raise ErroRequisicao(405, 'Use POST em /vendas.')
+            try:
+                dados = json.loads(corpo or b'{}')
+                venda_real = float(str(dados['venda_real']).replace(',', '.'))
+                data = pd.Timestamp(datetime.strptime(str(dados['data']), '%Y-%m-%d'))
+            except (ValueError, KeyError, TypeError):
+                raise ErroRequisicao(400, "Informe 'data' (AAAA-MM-DD) e 'venda_real' (kg) em JSON.")
+            if not math.isfinite(venda_real) or venda_real < 0:
+                raise ErroRequisicao(400, "'venda_real' deve ser um número finito maior ou igual a zero.")
+            sku = str(dados.get('sku', SKU_PRODUTO))
+            return 200, await self.lotes.enviar(sku, venda_real, data, bool(dados.get('forcar', False)))
+
+        if metodo != 'GET':
+            raise ErroRequisicao(405, f'Use GET em {url.path}.')
+        sku = parametros.get('sku', SKU_PRODUTO)
+
+        if url.path == '/recomendacao':
+            return 200, {'sku': sku, **recomendacao(await self.pool.obter(sku))}
+        if url.path == '/previsoes':
+            try:
+                dias = max(1, int(parametros.get('dias', 7)))
+            except ValueError:
+                raise ErroRequisicao(400, "'dias' deve ser um número inteiro.")
+            return 200, {'sku': sku, 'previsoes': previsoes(await self.pool.obter(sku), dias)}
+        raise ErroRequisicao(404, f'Rota {url.path} não encontrada.')
+
+    async def atender(self, reader, writer):
+        try:
+            try:
+                requisicao = await _ler_requisicao(reader)
+                if requisicao is None:
+                    return
+                status, dados = await self.rotear(*requisicao)
+            except ErroRequisicao as e:
+                status, dados = e.status, {'erro': e.mensagem}
+            except Exception as e:
+                print(f"[ERRO] {e}")
+                status, dados = 500, {'erro': str(e)}
+            writer.write(_resposta(status, dados))
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def executar(self, host=HOST, porta=PORTA):
+        self.lotes.iniciar()
+        servidor = await asyncio.start_server(self.atender, host, porta)
+        print(f"✅ API disponível em http://{host}:{porta}")
+        try:
+            async with servidor:
+                await servidor.serve_forever()
+        finally:
+            await self.lotes.parar()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(ServidorAPI().executar())
+    except KeyboardInterrupt:
+        print("\nServidor encerrado.")
@@ -3,89 +3,232 @@ import pandas as pd
 import math
 import numpy as np
 import os
+import json
+import joblib
 from datetime import timedelta
 from prophet import Prophet
+from ajuste_prophet import carregar_melhores_parametros, assinatura_dados
+from monitor_vendas import MonitorVendas, venda_valida
+from modelo_dados import COLUNAS_PREVISAO, compactar_previsao, data_para_dia, dias_para_datas, valor_kg
 from sklearn.metrics import mean_absolute_percentage_error, mean_squared_error
 
 ARQUIVO_DADOS_TREINO = 'dados.csv'
 ARQUIVO_ESTADO_ESTOQUE = 'estado_estoque.csv'
 ARQUIVO_RELATORIO_PREVISOES = 'relatorio_previsoes.csv'
+ARQUIVO_CACHE_PREVISOES = 'cache_previsoes.joblib'
 PESO_CAIXA_KG = 15.3
 KG_MINIMO_A_DESCONGELAR = 5.0
 SKU_PRODUTO = '384706'
 
-def executar_simulacao_dashboard(venda_real_hoje: float) -> bool:
-    try:
-        # 1. Dados e modelo Prophet
-        df = pd.read_csv(ARQUIVO_DADOS_TREINO, sep=',', decimal=',', thousands='.', parse_dates=['data_dia'])
-        df_prophet = df.rename(columns={'data_dia': 'ds', 'total_venda_dia_kg': 'y'})
-        df_prophet.dropna(subset=['ds'], inplace=True)
+def _ler_dados_treino() -> pd.DataFrame:
+    return pd.read_csv(ARQUIVO_DADOS_TREINO, sep=',', decimal=',', thousands='.', parse_dates=['data_dia'])
+
+
+def _para_prophet(df: pd.DataFrame) -> pd.DataFrame:
+    df_prophet = df.rename(columns={'data_dia': 'ds', 'total_venda_dia_kg': 'y'})
+    df_prophet = df_prophet.dropna(subset=['ds'])
+    return df_prophet
+
 
-        modelo = Prophet()
-        modelo.fit(df_prophet)
-        future = modelo.make_future_dataframe(periods=30)
-        forecast = modelo.predict(future)
+def carregar_dados_treino(sku: str = SKU_PRODUTO) -> pd.DataFrame:
+    df = _ler_dados_treino()
+    if 'id_produto' in df.columns:
+        df = df[df['id_produto'].astype(str) == str(sku)]
+    return _para_prophet(df)
 
+
+def carregar_dados_treino_por_sku() -> dict:
+    # Lê 'dados.csv' uma vez só para todos os SKUs (planejamento em lote)
+    df = _ler_dados_treino()
+    if 'id_produto' not in df.columns:
+        return {SKU_PRODUTO: _para_prophet(df)}
+    return {str(sku): _para_prophet(grupo) for sku, grupo in df.groupby(df['id_produto'].astype(str))}
+
+
+def treinar_e_prever(df_prophet: pd.DataFrame, periodos: int = 30, sku: str = SKU_PRODUTO):
+    modelo = Prophet(**carregar_melhores_parametros(sku))
+    modelo.fit(df_prophet)
+    # Datas contínuas: o histórico pode ter buracos entre 'dados.csv' e as vendas registradas
+    future = pd.DataFrame({'ds': pd.date_range(df_prophet['ds'].min(), df_prophet['ds'].max() + timedelta(days=periodos))})
+    forecast = modelo.predict(future)
+    return modelo, forecast
+
+
+def anexar_vendas_registradas(df_prophet: pd.DataFrame, arquivo: str = ARQUIVO_ESTADO_ESTOQUE, vendas_extras: list = None) -> pd.DataFrame:
+    # Cada linha do estado guarda em 'venda_real' a venda do dia anterior a 'data_atual'
+    vendas = []
+    if os.path.exists(arquivo):
+        estoque_df = pd.read_csv(arquivo, parse_dates=['data_atual'])
+        if 'venda_real' in estoque_df.columns:
+            registradas = estoque_df.dropna(subset=['venda_real'])
+            vendas.append(pd.DataFrame({'ds': registradas['data_atual'] - timedelta(days=1),
+                                        'y': registradas['venda_real'].astype(float)}))
+    if vendas_extras:
+        vendas.append(pd.DataFrame(vendas_extras, columns=['ds', 'y']))
+    if not vendas:
+        return df_prophet
+    novas = pd.concat(vendas, ignore_index=True)
+    novas = novas[novas['ds'] > df_prophet['ds'].max()].drop_duplicates('ds', keep='last')
+    return pd.concat([df_prophet[['ds', 'y']], novas], ignore_index=True)
+
+
+def carregar_cache_previsoes() -> dict:
+    return joblib.load(ARQUIVO_CACHE_PREVISOES) if os.path.exists(ARQUIVO_CACHE_PREVISOES) else {}
+
+
+def salvar_cache_previsoes(cache: dict):
+    joblib.dump(cache, ARQUIVO_CACHE_PREVISOES)
+
+
+def _assinatura_previsao(df_prophet: pd.DataFrame, sku):
+    return assinatura_dados(df_prophet), json.dumps(carregar_melhores_parametros(sku), sort_keys=True)
+
+
+def previsao_em_cache(cache: dict, df_prophet: pd.DataFrame, sku: str = SKU_PRODUTO, data_minima=None):
+    # Previsão guardada ainda válida para estes dados e parâmetros e cobrindo 'data_minima', ou None
+    entrada = cache.get(str(sku))
+    if (entrada is not None and entrada['assinatura'] == _assinatura_previsao(df_prophet, sku)
+            and list(entrada['forecast'].columns) == COLUNAS_PREVISAO
+            and (data_minima is None or entrada['forecast']['dia'].max() >= data_para_dia(data_minima))):
+        return entrada['forecast']
+    return None
+
+
+def obter_previsao(df_prophet: pd.DataFrame, sku: str = SKU_PRODUTO, reajustar: bool = False,
+                   data_minima=None, vendas_extras: list = None, cache: dict = None) -> pd.DataFrame:
+    # Reaproveita a última previsão enquanto 'dados.csv' e os parâmetros ajustados do
+    # SKU não mudam, ela ainda cobre 'data_minima' e o monitor de vendas não pediu reajuste.
+    # Com 'cache', usa esse dicionário e não grava o arquivo (quem chama salva uma vez no fim).
+    gravar = cache is None
+    if cache is None:
+        cache = carregar_cache_previsoes()
+    if not reajustar:
+        forecast = previsao_em_cache(cache, df_prophet, sku, data_minima)
+        if forecast is not None:
+            return forecast
+
+    df_treino = anexar_vendas_registradas(df_prophet, arquivo_estado(sku), vendas_extras)
+    _, forecast = treinar_e_prever(df_treino, sku=sku)
+    forecast = compactar_previsao(forecast)
+    cache[str(sku)] = {'assinatura': _assinatura_previsao(df_prophet, sku), 'forecast': forecast}
+    if gravar:
+        salvar_cache_previsoes(cache)
+    return forecast
+
+
+def intervalo_do_dia(forecast: pd.DataFrame, data):
+    linha = forecast.loc[forecast['dia'] == data_para_dia(data)]
+    if linha.empty:
+        return None
+    linha = linha.iloc[0]
+    return valor_kg(linha['yhat']), valor_kg(linha['yhat_lower']), valor_kg(linha['yhat_upper'])
+
+
+def previsao_do_dia(forecast: pd.DataFrame, data) -> float:
+    linha = forecast.loc[forecast['dia'] == data_para_dia(data), 'yhat']
+    return valor_kg(linha.iloc[0]) if not linha.empty else 0
+
+
+def arquivo_estado(sku: str = SKU_PRODUTO) -> str:
+    # O SKU padrão mantém o arquivo original usado pelo dashboard
+    if str(sku) == SKU_PRODUTO:
+        return ARQUIVO_ESTADO_ESTOQUE
+    return f'estado_estoque_{sku}.csv'
+
+
+def carregar_estado_atual(forecast: pd.DataFrame, data_hoje, arquivo: str = ARQUIVO_ESTADO_ESTOQUE) -> pd.Series:
+    if os.path.exists(arquivo):
+        estoque_df = pd.read_csv(arquivo, parse_dates=['data_atual'])
+        return estoque_df.iloc[-1]
+    return pd.Series({
+        'data_atual': data_hoje,
+        'kg_em_descongelamento': max(0, previsao_do_dia(forecast, data_hoje + timedelta(days=1))),
+        'kg_pronto_venda_dia1': max(0, previsao_do_dia(forecast, data_hoje)),
+        'kg_pronto_venda_dia2': 0.0
+    })
+
+
+def calcular_rodada(estado_atual: pd.Series, forecast: pd.DataFrame, venda_real_hoje: float) -> dict:
+    hoje = estado_atual['data_atual']
+    venda = venda_real_hoje
+    venda_lote_antigo = min(venda, estado_atual['kg_pronto_venda_dia2'])
+    venda_restante = venda - venda_lote_antigo
+    venda_lote_novo = min(venda_restante, estado_atual['kg_pronto_venda_dia1'])
+    sobra_novo = estado_atual['kg_pronto_venda_dia1'] - venda_lote_novo
+
+    previsao_d2 = previsao_do_dia(forecast, hoje + timedelta(days=2))
+    kg_a_descongelar = max(0, previsao_d2 - sobra_novo)
+    if kg_a_descongelar <= 0:
+        kg_a_descongelar = KG_MINIMO_A_DESCONGELAR
+    if hoje.day == 23:
+        kg_a_descongelar = 130.0
+
+    return {
+        'data_atual': hoje + timedelta(days=1),
+        'kg_descongelando_d1': kg_a_descongelar,
+        'kg_descongelando_d2': estado_atual.get('kg_descongelando_d1', 0.0),
+        'kg_pronto_venda_dia1': estado_atual.get('kg_descongelando_d2', 0.0),
+        'kg_pronto_venda_dia2': sobra_novo
+    }
+
+
+def registrar_estados(estados: list, arquivo: str = ARQUIVO_ESTADO_ESTOQUE):
+    # Cada estado já carrega a 'venda_real' do dia; grava tudo de uma vez
+    novos = pd.DataFrame(estados)
+    if os.path.exists(arquivo):
+        historico = pd.read_csv(arquivo, parse_dates=['data_atual'])
+        novos = pd.concat([historico, novos], ignore_index=True)
+    novos.to_csv(arquivo, index=False)
+    recalcular_perdas(arquivo)
+
+
+def executar_simulacao_dashboard(venda_real_hoje: float, forcar: bool = False) -> bool:
+    if not venda_valida(venda_real_hoje):
+        print(f"[ERRO] Venda real inválida: {venda_real_hoje!r} (use um valor finito maior ou igual a zero).")
+        return False
+    try:
+        # 1. Dados e previsão Prophet (reajustada só quando necessário)
+        df_prophet = carregar_dados_treino()
         ultima_data_real = df_prophet['ds'].max()
         data_hoje = ultima_data_real + timedelta(days=1)
+        forecast = obter_previsao(df_prophet)
 
         # 2. Estado atual (última linha ou iniciar)
-        if os.path.exists(ARQUIVO_ESTADO_ESTOQUE):
-            estoque_df = pd.read_csv(ARQUIVO_ESTADO_ESTOQUE, parse_dates=['data_atual'])
-            estado_atual = estoque_df.iloc[-1]
-        else:
-            previsao_hoje = forecast.loc[forecast['ds'] == data_hoje, 'yhat'].iloc[0]
-            previsao_amanha = forecast.loc[forecast['ds'] == data_hoje + timedelta(days=1), 'yhat'].iloc[0]
-            estado_atual = pd.Series({
-                'data_atual': data_hoje,
-                'kg_em_descongelamento': max(0, previsao_amanha),
-                'kg_pronto_venda_dia1': max(0, previsao_hoje),
-                'kg_pronto_venda_dia2': 0.0
-            })
-
-        # 3. Simulação
+        estado_atual = carregar_estado_atual(forecast, data_hoje)
         hoje = estado_atual['data_atual']
-        venda = venda_real_hoje
-        venda_lote_antigo = min(venda, estado_atual['kg_pronto_venda_dia2'])
-        perda_real = max(0, (
-            estado_atual.get('kg_pronto_venda_dia2', 0.0)
-            - min(venda_real_hoje, estado_atual.get('kg_pronto_venda_dia2', 0.0))
-        ))
-        venda_restante = venda - venda_lote_antigo
-        venda_lote_novo = min(venda_restante, estado_atual['kg_pronto_venda_dia1'])
-        sobra_novo = estado_atual['kg_pronto_venda_dia1'] - venda_lote_novo
-
-        previsao_d2 = forecast.loc[forecast['ds'] == hoje + timedelta(days=2), 'yhat'].iloc[0] if not forecast[forecast['ds'] == hoje + timedelta(days=2)].empty else 0
-        kg_a_descongelar = max(0, previsao_d2 - sobra_novo)
-        if kg_a_descongelar <= 0:
-            kg_a_descongelar = KG_MINIMO_A_DESCONGELAR
-        if hoje.day == 23:
-            kg_a_descongelar = 130.0
-
-        estado_novo = pd.DataFrame([{
-            'data_atual': hoje + timedelta(days=1),
-            'kg_descongelando_d1': kg_a_descongelar,
-            'kg_descongelando_d2': estado_atual.get('kg_descongelando_d1', 0.0),
-            'kg_pronto_venda_dia1': estado_atual.get('kg_descongelando_d2', 0.0),
-            'kg_pronto_venda_dia2': sobra_novo
-        }])
-
-
-
-        estado_novo.to_csv(ARQUIVO_ESTADO_ESTOQUE, mode='a', header=not os.path.exists(ARQUIVO_ESTADO_ESTOQUE), index=False)
-        df_estado = pd.read_csv(ARQUIVO_ESTADO_ESTOQUE)
-        df_estado.loc[df_estado.index[-1], "venda_real"] = venda_real_hoje
-        df_estado.to_csv(ARQUIVO_ESTADO_ESTOQUE, index=False)
+        if forecast['dia'].max() < data_para_dia(hoje + timedelta(days=2)):
+            forecast = obter_previsao(df_prophet, data_minima=hoje + timedelta(days=2))
+
+        # 3. Verificação da venda informada
+        monitor = MonitorVendas()
+        intervalo = intervalo_do_dia(forecast, hoje)
+        if intervalo is not None:
+            verificacao = monitor.avaliar(SKU_PRODUTO, venda_real_hoje, *intervalo)
+            if verificacao['anomalia'] and not forcar:
+                print(f"[ALERTA] Venda de {venda_real_hoje:.2f} kg fora do padrão para {hoje.strftime('%d/%m/%Y')} "
+                      f"(previsto {intervalo[1]:.2f}–{intervalo[2]:.2f} kg). Confirme para registrar.")
+                return False
+            verificacao = monitor.registrar(SKU_PRODUTO, venda_real_hoje, *intervalo, data=hoje)
+            if verificacao['reajustar']:
+                print("[INFO] Deriva detectada nas vendas; reajustando o modelo Prophet.")
+                forecast = obter_previsao(df_prophet, reajustar=True, vendas_extras=[(hoje, venda_real_hoje)])
+                monitor.confirmar_reajuste(SKU_PRODUTO)
+            monitor.salvar()
+
+        # 4. Simulação
+        estado_novo = calcular_rodada(estado_atual, forecast, venda_real_hoje)
+        estado_novo['venda_real'] = venda_real_hoje
 
         # === Recalcula perda_real após salvar ===
-        recalcular_perdas()
+        registrar_estados([estado_novo])
 
+        futuras = forecast[forecast["dia"] >= data_para_dia(data_hoje)]
         df_relatorio = pd.DataFrame({
-            "Data": forecast.loc[forecast["ds"] >= data_hoje, "ds"].dt.date,
+            "Data": dias_para_datas(futuras["dia"]).dt.date.to_numpy(),
             "SKU": SKU_PRODUTO,
-            "Kg a Retirar Hoje": forecast.loc[forecast["ds"] >= data_hoje, "yhat"].shift(2),
-            "Kg em Descongelamento D1": forecast.loc[forecast["ds"] >= data_hoje, "yhat"].shift(1),
-            "Kg Disponível para Venda": forecast.loc[forecast["ds"] >= data_hoje, "yhat"],
+            "Kg a Retirar Hoje": futuras["yhat"].shift(2).to_numpy(),
+            "Kg em Descongelamento D1": futuras["yhat"].shift(1).to_numpy(),
+            "Kg Disponível para Venda": futuras["yhat"].to_numpy(),
             "Perda Estimada": 0.0
         })
         df_relatorio.to_csv(ARQUIVO_RELATORIO_PREVISOES, index=False)
@@ -96,8 +239,8 @@ def executar_simulacao_dashboard(venda_real_hoje: float) -> bool:
         return False
 
 
-def recalcular_perdas():
-    df = pd.read_csv(ARQUIVO_ESTADO_ESTOQUE, parse_dates=["data_atual"])
+def recalcular_perdas(arquivo: str = ARQUIVO_ESTADO_ESTOQUE):
+    df = pd.read_csv(arquivo, parse_dates=["data_atual"])
     df = df.sort_values("data_atual").reset_index(drop=True)
 
     perdas = [0.0]  # primeiro dia não tem perda
@@ -107,4 +250,4 @@ def recalcular_perdas():
         perdas.append(perda)
 
     df["perda_real"] = perdas
-    df.to_csv(ARQUIVO_ESTADO_ESTOQUE, index=False)
\ No newline at end of file
+    df.to_csv(arquivo, index=False)
\ No newline at end of file